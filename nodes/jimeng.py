@@ -6,7 +6,7 @@ import torch
 from PIL import Image
 import numpy as np
 from dotenv import load_dotenv
-from .webdriver import generate_image
+from .webdriver import generate_image, CancelToken, _comfy_model_management
 
 load_dotenv()
 
@@ -83,21 +83,30 @@ def _save_image_any(img: Union["torch.Tensor", "Image.Image"], out_path: str):
 
 
 # --- 通过 Web 服务调用生成接口 ---
-def request_generate_image_api(model, prompt, size: str = None, refs_json: str = None):
+def request_generate_image_api(model, prompt, size: str = None, refs_json: str = None, cancel_token: CancelToken = None):
     """
     直接通过 webdriver 生成图片的函数封装，保持返回结构一致
     - prompt: 文本提示词
     - size: 比值字符串，如 "9:16"
     - refs_json: JSON 序列化的本地图片路径数组字符串
+    - cancel_token: 取消令牌，触发后尽快中止浏览器操作并返回
     """
     try:
         refs = json.loads(refs_json) if refs_json else []
-        result = generate_image(model=model, prompt=prompt, size=size or "9:16", refs=refs)
+        result = generate_image(model=model, prompt=prompt, size=size or "9:16", refs=refs, cancel_token=cancel_token)
         return result
     except Exception as e:
         return {"errcode": 1, "errmsg": f"请求异常: {e}"}
 
 
+def _throw_if_interrupted():
+    # 在 ComfyUI 中以其标准中断异常结束节点；独立运行时无操作
+    mm = _comfy_model_management()
+    if mm is None:
+        return
+    mm.throw_exception_if_processing_interrupted()
+
+
 class JiMengNode:
     @classmethod
     def INPUT_TYPES(cls):
@@ -119,6 +128,7 @@ class JiMengNode:
     CATEGORY = "image"
 
     def run(self, model, prompt, size=None, images=None, seed=None):
+        _throw_if_interrupted()
         reset_resources()
 
         saved_paths: List[str] = []
@@ -139,6 +149,10 @@ class JiMengNode:
         print(saved_paths)
         # 调用接口生成图片
         response = request_generate_image_api(model, prompt, size_arg, json.dumps(saved_paths))
+        if response.get("cancelled"):
+            print("生成已取消")
+            _throw_if_interrupted()
+            return (None,)
         if response.get("errcode") != 0:
             print(f"接口调用失败，错误码：{response.get('errcode')}，错误信息：{response.get('errmsg')}")
             return (None,)
@@ -3,11 +3,14 @@ import threading
 import json
 import os
 import sys
+import hashlib
+import time
 import traceback
+import weakref
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 import logging
-from playwright.async_api import async_playwright, BrowserContext, Page
+from playwright.async_api import async_playwright, Browser, BrowserContext, Page
 import shutil
 
 # 配置日志格式
@@ -32,6 +35,90 @@ SIZE_PRESET = [
 root_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 STATE_PATH: Optional[str] = None
 
+# 判断登录态的关键 cookie（字节系账号体系），及视为即将过期的提前量（秒）
+AUTH_COOKIE_NAMES = ("sessionid", "sessionid_ss", "sid_tt")
+AUTH_COOKIE_DOMAIN = "jianying.com"
+COOKIE_EXPIRY_MARGIN = 300
+# 登录态文件的写锁，ComfyUI 多线程与批量并发任务共用
+_state_lock = threading.Lock()
+# 每个 context 创建时载入的登录态快照，保存时据此判断哪些 cookie 是该 context 改动的
+_context_snapshots: "weakref.WeakKeyDictionary[BrowserContext, Dict[str, Any]]" = weakref.WeakKeyDictionary()
+
+# 取消检测的轮询间隔（秒）与取消后关闭浏览器的总时限（秒）；正常结束时关闭不设时限
+CANCEL_POLL_INTERVAL = 0.1
+CANCEL_CLEANUP_TIMEOUT = 0.8
+
+
+class GenerationCancelled(Exception):
+    """生成任务被取消（用户中断或取消令牌触发）"""
+
+
+class CancelToken:
+    """跨线程取消令牌，可在任意线程调用 cancel()，由事件循环侧轮询"""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+
+_comfy_mm = None
+_comfy_resolved = False
+
+
+def _comfy_model_management():
+    # 只解析一次 comfy 模块并缓存结果（包括不存在的情况），避免每次轮询都重新搜索 sys.path
+    global _comfy_mm, _comfy_resolved
+    if not _comfy_resolved:
+        try:
+            import comfy.model_management as mm
+            _comfy_mm = mm
+        except Exception:
+            _comfy_mm = None
+        _comfy_resolved = True
+    return _comfy_mm
+
+
+def _comfy_interrupted() -> bool:
+    # 在 ComfyUI 环境中检查队列是否被中断；独立运行时 comfy 不存在，视为未中断
+    mm = _comfy_model_management()
+    if mm is None:
+        return False
+    try:
+        return bool(mm.processing_interrupted())
+    except Exception:
+        return False
+
+
+def _is_cancelled(cancel_token: Optional[CancelToken]) -> bool:
+    return (cancel_token is not None and cancel_token.cancelled) or _comfy_interrupted()
+
+
+async def _run_cancellable(coro, cancel_token: Optional[CancelToken]):
+    """运行协程，取消令牌触发或 ComfyUI 中断时取消任务并抛出 GenerationCancelled。
+    被取消的任务会在其 finally 中关闭浏览器，这里等待清理完成后再返回。
+    """
+    task = asyncio.ensure_future(coro)
+    try:
+        while not task.done():
+            if _is_cancelled(cancel_token):
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+                raise GenerationCancelled("已取消")
+            await asyncio.wait({task}, timeout=CANCEL_POLL_INTERVAL)
+        return task.result()
+    finally:
+        if not task.done():
+            task.cancel()
+
 
 def _normalize_viewport(viewport: Optional[Dict[str, Any]]) -> Optional[Dict[str, int]]:
     try:
@@ -113,7 +200,7 @@ async def _apply_stealth(context: BrowserContext):
     )
 
 
-async def _launch_browser(state_json: str, headless: bool, viewport: Optional[Dict[str, int]]):
+def _prepare_state(state_json: str):
     global STATE_PATH
     state_dir = os.path.join(root_path, "state")
     os.makedirs(state_dir, exist_ok=True)
@@ -122,27 +209,132 @@ async def _launch_browser(state_json: str, headless: bool, viewport: Optional[Di
         with open(STATE_PATH, "w", encoding="utf-8") as f:
             f.write("{}")
 
-    parsed_viewport = _normalize_viewport(viewport) or _default_viewport()
 
+def _read_state() -> Dict[str, Any]:
+    try:
+        with open(STATE_PATH, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        return state if isinstance(state, dict) else {}
+    except Exception:
+        return {}
+
+
+def _cookie_key(cookie: Dict[str, Any]):
+    return (cookie.get("domain"), cookie.get("path"), cookie.get("name"))
+
+
+def _probe_session() -> Optional[bool]:
+    """不启动浏览器，根据 state.json 中的 cookie 判断登录态。
+    - False: 没有即梦 cookie，或关键 cookie 均已（即将）过期，需要登录
+    - True: 存在未过期的关键 cookie
+    - None: 无法判断（例如关键 cookie 名称变化），交由页面跳转检测
+    """
+    cookies = [c for c in _read_state().get("cookies") or [] if AUTH_COOKIE_DOMAIN in (c.get("domain") or "")]
+    if not cookies:
+        return False
+    auth_cookies = [c for c in cookies if c.get("name") in AUTH_COOKIE_NAMES and c.get("value")]
+    if not auth_cookies:
+        return None
+    deadline = time.time() + COOKIE_EXPIRY_MARGIN
+    # expires 为 -1 表示会话 cookie，没有过期时间
+    return any(c.get("expires", -1) == -1 or c.get("expires", -1) > deadline for c in auth_cookies)
+
+
+def _load_state_for_context() -> Dict[str, Any]:
+    # 在写锁内读取 state.json，保证新建 context 时拿到的是完整的一份快照
+    with _state_lock:
+        state = _read_state()
+    return {"cookies": state.get("cookies") or [], "origins": state.get("origins") or []}
+
+
+def _cookie_same(a: Optional[Dict[str, Any]], b: Optional[Dict[str, Any]]) -> bool:
+    # 只比较值与过期时间，忽略 playwright 读回时可能补全或规范化的其它字段
+    if a is None or b is None:
+        return a is b
+    return a.get("value") == b.get("value") and int(a.get("expires") or -1) == int(b.get("expires") or -1)
+
+
+def _merge_by_key(
+    base: List[Dict[str, Any]],
+    ours: List[Dict[str, Any]],
+    theirs: List[Dict[str, Any]],
+    key,
+    same=lambda a, b: a == b,
+) -> List[Dict[str, Any]]:
+    # 三方合并：以文件当前内容 theirs 为底，只应用本 context 相对其初始快照 base 的改动（新增、修改、删除）
+    base_map = {key(x): x for x in base}
+    ours_map = {key(x): x for x in ours}
+    merged = {key(x): x for x in theirs}
+    for k, item in ours_map.items():
+        if not same(base_map.get(k), item):
+            merged[k] = item
+    for k in base_map:
+        if k not in ours_map:
+            merged.pop(k, None)
+    return list(merged.values())
+
+
+async def _save_storage_state(context: BrowserContext) -> bool:
+    """保存 context 的登录态，仅在 cookie 变化时写入，先写临时文件再原子替换。
+    context 的 cookie 为准；若 context 创建后 state.json 已被其它任务更新，则只合并本 context 改动过的 cookie，
+    避免较早启动的任务用旧快照覆盖保活或重新登录写入的新 cookie。
+    """
+    state = await context.storage_state()
+    snapshot = _context_snapshots.get(context)
+    with _state_lock:
+        old_state = _read_state()
+        old_cookies = sorted(old_state.get("cookies") or [], key=_cookie_key)
+        # 没有快照（非 _new_page 创建）时视为文件未被他人修改，直接以 context 为准
+        base = snapshot if snapshot is not None else {"cookies": old_cookies, "origins": old_state.get("origins") or []}
+        new_cookies = sorted(
+            _merge_by_key(base["cookies"], state.get("cookies") or [], old_cookies, _cookie_key, _cookie_same),
+            key=_cookie_key,
+        )
+        if old_cookies == new_cookies:
+            return False
+        origins = _merge_by_key(
+            base["origins"], state.get("origins") or [], old_state.get("origins") or [], lambda o: o.get("origin")
+        )
+        tmp_path = f"{STATE_PATH}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"cookies": new_cookies, "origins": origins}, f, ensure_ascii=False)
+        os.replace(tmp_path, STATE_PATH)
+    # 写入后以新内容作为该 context 的快照，后续再次保存时只比较之后的改动
+    _context_snapshots[context] = {"cookies": new_cookies, "origins": origins}
+    logging.info(f"登录状态已更新: {STATE_PATH}")
+    return True
+
+
+async def _start_browser(headless: bool):
     p = await async_playwright().start()
-    browser = await p.chromium.launch(
-        headless=headless,
-        args=[
-            "--disable-blink-features=AutomationControlled",
-            "--disable-features=WebRtcHideLocalIpsWithMdns",
-            "--lang=zh-CN,zh",
-            "--no-sandbox",
-            "--disable-setuid-sandbox",
-            "--disable-infobars",
-            "--window-position=0,0",
-            "--ignore-certifcate-errors",
-            "--ignore-certifcate-errors-spki-list",
-            "--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0.0.0 Safari/537.36",
-            "--no-proxy-server",
-        ],
-        ignore_default_args=['--enable-automation'],
-    )
+    try:
+        browser = await p.chromium.launch(
+            headless=headless,
+            args=[
+                "--disable-blink-features=AutomationControlled",
+                "--disable-features=WebRtcHideLocalIpsWithMdns",
+                "--lang=zh-CN,zh",
+                "--no-sandbox",
+                "--disable-setuid-sandbox",
+                "--disable-infobars",
+                "--window-position=0,0",
+                "--ignore-certifcate-errors",
+                "--ignore-certifcate-errors-spki-list",
+                "--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0.0.0 Safari/537.36",
+                "--no-proxy-server",
+            ],
+            ignore_default_args=['--enable-automation'],
+        )
+    except BaseException as err:
+        # 启动过程中失败或被取消时，停止 playwright 以免遗留浏览器进程
+        await _close_all([p.stop], _cleanup_timeout(err))
+        raise
+    return p, browser
+
 
+async def _new_page(browser: Browser, viewport: Optional[Dict[str, int]]):
+    parsed_viewport = _normalize_viewport(viewport) or _default_viewport()
+    snapshot = _load_state_for_context()
     context = await browser.new_context(
         viewport=parsed_viewport,
         user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0.0.0 Safari/537.36",
@@ -153,18 +345,67 @@ async def _launch_browser(state_json: str, headless: bool, viewport: Optional[Di
         is_mobile=False,
         has_touch=False,
         accept_downloads=True,
-        storage_state=STATE_PATH,
+        storage_state=snapshot,
     )
+    _context_snapshots[context] = snapshot
+    try:
+        await context.grant_permissions(["geolocation", "notifications"])
+
+        # 应用伪装
+        await _apply_stealth(context)
 
-    await context.grant_permissions(["geolocation", "notifications"])
+        page = await context.new_page()
+    except BaseException as err:
+        await _close_all([context.close], _cleanup_timeout(err))
+        raise
+    return page, context
 
-    # 应用伪装
-    await _apply_stealth(context)
 
-    page = await context.new_page()
+async def _launch_browser(state_json: str, headless: bool, viewport: Optional[Dict[str, int]]):
+    _prepare_state(state_json)
+    p, browser = await _start_browser(headless)
+    try:
+        page, context = await _new_page(browser, viewport)
+    except BaseException as err:
+        await _close_all([browser.close, p.stop], _cleanup_timeout(err))
+        raise
     return p, page, context
 
 
+def _cleanup_timeout(err: Optional[BaseException] = None, cancelled: bool = False) -> Optional[float]:
+    # 仅在取消时限制关闭耗时，正常结束或出错时等待浏览器与驱动进程完全退出
+    if cancelled or isinstance(err, asyncio.CancelledError):
+        return CANCEL_CLEANUP_TIMEOUT
+    return None
+
+
+async def _close_all(closers: List[Any], timeout: Optional[float] = None):
+    """依次执行关闭操作，timeout 为整体时限（None 表示一直等待）。"""
+    async def run():
+        for close in closers:
+            try:
+                await close()
+            except Exception as err:
+                logging.info(f"关闭浏览器失败: {getattr(err, 'message', str(err))}")
+
+    if timeout is None:
+        await run()
+        return
+    try:
+        await asyncio.wait_for(run(), timeout=timeout)
+    except asyncio.TimeoutError:
+        logging.warning(f"取消后 {timeout}s 内未能关闭浏览器，可能残留浏览器进程")
+
+
+async def _close_context(context: BrowserContext, cancelled: bool = False):
+    await _close_all([context.close], _cleanup_timeout(cancelled=cancelled))
+
+
+async def _close_browser(p, context: BrowserContext, cancelled: bool = False):
+    # 显式关闭浏览器后再停止 playwright 驱动
+    await _close_all([context.browser.close, p.stop], _cleanup_timeout(cancelled=cancelled))
+
+
 async def _goto_by_url(page: Page, url: str):
     retries = 3
     while retries > 0:
@@ -182,36 +423,39 @@ async def _goto_by_url(page: Page, url: str):
 async def _do_login():
     logging.info("请在打开的浏览器中完成登录操作...")
     p, page, context = await _launch_browser("state.json", headless=False, viewport=_default_viewport())
+    cancelled = False
     try:
         await _goto_by_url(page, "https://jimeng.jianying.com/ai-tool/home")
 
         login_avatar = page.locator("div#Personal>>img").first
         await login_avatar.wait_for(timeout=600000)
-        await context.storage_state(path=STATE_PATH)
+        await _save_storage_state(context)
         logging.info(f"登录状态已保存到: {STATE_PATH}")
-        await context.close()
-        await p.stop()
         return True
-    except Exception as err:
-        try:
-            await context.close()
-            await p.stop()
-        except Exception:
-            pass
-        raise err
-
-
-async def _generate_image(params: Dict[str, Any]):
-    # params: { model, prompt, size, refs, clientViewport }
-    p, page, context = await _launch_browser("state.json", headless=True, viewport=params.get("clientViewport"))
+    except asyncio.CancelledError:
+        cancelled = True
+        raise
+    finally:
+        # 正常结束、异常或被取消时都释放浏览器
+        await _close_browser(p, context, cancelled)
+
+
+async def _generate_image(params: Dict[str, Any], browser: Optional[Browser] = None):
+    # params: { model, prompt, size, refs, clientViewport, downloadsDir }
+    # 传入 browser 时复用共享浏览器，仅为本次任务新建 context，结束后只关闭该 context
+    if browser is not None:
+        _prepare_state("state.json")
+        p = None
+        page, context = await _new_page(browser, params.get("clientViewport"))
+    else:
+        p, page, context = await _launch_browser("state.json", headless=True, viewport=params.get("clientViewport"))
+    cancelled = False
     try:
         logging.info("开始生成图片...")
         await _goto_by_url(page, "https://jimeng.jianying.com/ai-tool/generate?type=image")
 
         if page.url == "https://jimeng.jianying.com/ai-tool/home":
             logging.info("未登录")
-            await context.close()
-            await p.stop()
             return False
 
         # 关闭浮层
@@ -268,34 +512,37 @@ async def _generate_image(params: Dict[str, Any]):
         img_first = container.locator("div[class*='record-box-wrapper-'] >> img").first
 
         # 等待失败提示或第一张图片出现（谁先出现就返回）
+        wait_tasks = [
+            asyncio.create_task(error_tips.wait_for(state="visible", timeout=300000)),
+            asyncio.create_task(img_first.wait_for(state="visible", timeout=300000)),
+        ]
         try:
-            wait_tasks = [
-                asyncio.create_task(error_tips.wait_for(state="visible", timeout=300000)),
-                asyncio.create_task(img_first.wait_for(state="visible", timeout=300000)),
-            ]
-            done, pending = await asyncio.wait(wait_tasks, return_when=asyncio.FIRST_COMPLETED)
-            # 取消未完成的等待，避免资源泄露
-            for t in pending:
-                t.cancel()
+            await asyncio.wait(wait_tasks, return_when=asyncio.FIRST_COMPLETED)
         except Exception:
             # 任一等待失败不影响后续判断
             pass
+        finally:
+            # 取消未完成的等待（包括整体被取消时），避免资源泄露
+            for t in wait_tasks:
+                if not t.done():
+                    t.cancel()
 
         if await error_tips.is_visible():
             logging.info("生成失败")
-            await _set_response({
-                "errcode": 1,
-                "errmsg": "生成失败:" + (await error_tips.text_content() or "")
-            })
-            await context.close()
-            await p.stop()
+            # 记录到 params 供批量模式写入清单；批量模式（共享 browser）不再逐条打印到 stdout
+            params["errmsg"] = "生成失败:" + (await error_tips.text_content() or "")
+            if browser is None:
+                await _set_response({
+                    "errcode": 1,
+                    "errmsg": params["errmsg"],
+                })
             return True
 
         img_list = container.locator("div[class*='record-box-wrapper-'] >> img")
         count = await img_list.count()
         logging.info(f"图片数量: {count}")
 
-        downloads_dir = os.path.join(root_path, "downloads")
+        downloads_dir = params.get("downloadsDir") or os.path.join(root_path, "downloads")
         if os.path.exists(downloads_dir):
             # 清空
             for root, dirs, files in os.walk(downloads_dir, topdown=False):
@@ -342,23 +589,24 @@ async def _generate_image(params: Dict[str, Any]):
                 save_paths.append(save_path)
                 logging.info(f"图片 {i + 1} 下载完成: {save_path}")
 
-        await context.storage_state(path=STATE_PATH)
+        await _save_storage_state(context)
 
-        await _set_response({
-            "errcode": 0,
-            "errmsg": "success",
-            "data": {"imageList": save_paths},
-        })
-        await context.close()
-        await p.stop()
+        if browser is None:
+            await _set_response({
+                "errcode": 0,
+                "errmsg": "success",
+                "data": {"imageList": save_paths},
+            })
         return True
-    except Exception as err:
-        try:
-            await context.close()
-            await p.stop()
-        except Exception:
-            pass
-        raise err
+    except asyncio.CancelledError:
+        cancelled = True
+        raise
+    finally:
+        # 正常结束、异常或被取消时都释放浏览器
+        if p is None:
+            await _close_context(context, cancelled)
+        else:
+            await _close_browser(p, context, cancelled)
 
 async def _set_response(response: Dict[str, Any]):
     data = json.dumps({
@@ -376,6 +624,26 @@ def _compose_client_viewport(client_width: Optional[int], client_height: Optiona
     return None
 
 
+def _build_params(
+    model: str,
+    prompt: Any,
+    size: str,
+    refs: Any,
+    client_viewport: Optional[Dict[str, int]] = None,
+) -> Dict[str, Any]:
+    prompt_text = (prompt if isinstance(prompt, str) else str(prompt or ""))[:450]
+    refs_input: List[str] = []
+    if isinstance(refs, list):
+        refs_input = [r for r in refs if isinstance(r, str) and os.path.exists(r)][:3]
+    return {
+        "model": model,
+        "prompt": prompt_text,
+        "size": size,
+        "refs": refs_input,
+        "clientViewport": client_viewport,
+    }
+
+
 async def generate_image_func(
     model: str = "图片 4.0",
     prompt: str = "1girl",
@@ -383,36 +651,23 @@ async def generate_image_func(
     refs: Optional[List[str]] = None,
     client_width: Optional[int] = None,
     client_height: Optional[int] = None,
+    cancel_token: Optional[CancelToken] = None,
 ) -> Dict[str, Any]:
     try:
         if size not in SIZE_PRESET:
             logging.info("分辨率参数错误")
             return {"errcode": 1, "errmsg": "分辨率参数错误"}
 
-        prompt_text = (prompt if isinstance(prompt, str) else str(prompt or ""))[:450]
-        refs_input: List[str] = []
-        if isinstance(refs, list):
-            refs_input = [r for r in refs if isinstance(r, str) and os.path.exists(r)][:3]
-
-        client_viewport = _compose_client_viewport(client_width, client_height)
-
-        ok = await _generate_image({
-            "model": model,
-            "prompt": prompt_text,
-            "size": size,
-            "refs": refs_input,
-            "clientViewport": client_viewport,
-        })
+        params = _build_params(model, prompt, size, refs, _compose_client_viewport(client_width, client_height))
+        _prepare_state("state.json")
+        if _probe_session() is False:
+            logging.info("登录态已失效，先登录")
+            await _run_cancellable(_do_login(), cancel_token)
+        ok = await _run_cancellable(_generate_image(params), cancel_token)
 
         if not ok:
-            await _do_login()
-            ok = await _generate_image({
-                "model": model,
-                "prompt": prompt_text,
-                "size": size,
-                "refs": refs_input,
-                "clientViewport": client_viewport,
-            })
+            await _run_cancellable(_do_login(), cancel_token)
+            ok = await _run_cancellable(_generate_image(params), cancel_token)
 
         downloads_dir = os.path.join(root_path, "downloads")
         image_list = [os.path.join(downloads_dir, f) for f in os.listdir(downloads_dir)] if os.path.exists(downloads_dir) else []
@@ -422,6 +677,9 @@ async def generate_image_func(
             return {"errcode": 1, "errmsg": "生成失败或超时"}
 
         return {"errcode": 0, "errmsg": "success", "data": {"imageList": image_list}}
+    except GenerationCancelled:
+        logging.info("生成已取消")
+        return {"errcode": 1, "errmsg": "已取消", "cancelled": True}
     except Exception as error:
         stack = traceback.format_exc()
         logging.info(getattr(error, "message", str(error)) or "生成异常", stack)
@@ -467,6 +725,7 @@ def generate_image(
     refs: Optional[List[str]] = None,
     client_width: Optional[int] = None,
     client_height: Optional[int] = None,
+    cancel_token: Optional[CancelToken] = None,
 ) -> Dict[str, Any]:
     # 清空ref和downloads目录（若传入了refs则不清空refs目录，避免删掉输入图片）
     try:
@@ -484,7 +743,7 @@ def generate_image(
         # 清理目录失败不影响后续生成流程
         pass
 
-    return _run_async_blocking(generate_image_func(model, prompt, size, refs, client_width, client_height))
+    return _run_async_blocking(generate_image_func(model, prompt, size, refs, client_width, client_height, cancel_token))
 
 
 def login():
@@ -492,6 +751,213 @@ def login():
     return _run_async_blocking(_do_login())
 
 
+def _load_manifest_done(output_path: str) -> set:
+    # 读取已有结果清单，返回已成功完成的任务 id，用于断点续跑
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except Exception:
+                continue
+            if record.get("errcode") == 0:
+                done.add(str(record.get("id")))
+    return done
+
+
+def _job_content_id(job: Dict[str, Any]) -> str:
+    # 未指定 id 的任务按内容生成 id，增删其它行不会影响断点续跑
+    content = [job.get("prompt"), job.get("size"), job.get("model"), job.get("refs")]
+    return hashlib.sha1(json.dumps(content, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def _load_jobs(jobs_path: str) -> List[Dict[str, Any]]:
+    # 每行一个 {prompt, size, model, refs[, id]}，未指定 id 时按内容生成；id 重复时拒绝整个任务文件
+    jobs: List[Dict[str, Any]] = []
+    seen: Dict[str, int] = {}
+    with open(jobs_path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                job = json.loads(line)
+                if not isinstance(job, dict):
+                    raise ValueError("任务必须是 JSON 对象")
+            except Exception as err:
+                job = {"error": f"第 {line_no} 行解析失败: {err}", "prompt": line}
+            job["id"] = str(job["id"]) if job.get("id") is not None else _job_content_id(job)
+            if job["id"] in seen:
+                raise ValueError(f"第 {line_no} 行任务 id 与第 {seen[job['id']]} 行重复（内容相同的任务请指定不同的 id）: {job['id']}")
+            seen[job["id"]] = line_no
+            jobs.append(job)
+    return jobs
+
+
+def _job_dir(out_dir: str, job_id: str) -> str:
+    # 目录名取 id 的哈希，避免 id 中的 ".."、分隔符等越出 out_dir 或多个 id 映射到同一目录；
+    # _generate_image 会先清空该目录，所以这里再确认一次路径位于 out_dir 之内
+    base = os.path.realpath(out_dir)
+    job_dir = os.path.realpath(os.path.join(base, hashlib.sha1(job_id.encode("utf-8")).hexdigest()[:16]))
+    if os.path.dirname(job_dir) != base:
+        raise ValueError(f"任务目录越界: {job_dir}")
+    return job_dir
+
+
+async def _run_batch_job(
+    job: Dict[str, Any],
+    browser: Browser,
+    out_dir: str,
+    login_state: Dict[str, Any],
+    default_model: str,
+) -> Dict[str, Any]:
+    if job.get("error"):
+        return {"errcode": 1, "errmsg": job["error"]}
+
+    size = job.get("size") or "9:16"
+    if size not in SIZE_PRESET:
+        return {"errcode": 1, "errmsg": "分辨率参数错误"}
+
+    params = _build_params(job.get("model") or default_model, job.get("prompt"), size, job.get("refs"))
+    params["downloadsDir"] = _job_dir(out_dir, job["id"])
+    # 清掉上次中断遗留的图片，避免失败时把旧图片当作本次结果
+    shutil.rmtree(params["downloadsDir"], ignore_errors=True)
+
+    epoch = login_state["epoch"]
+    ok = await _generate_image(params, browser)
+    if not ok:
+        # 多个任务同时发现未登录时只弹出一次登录窗口
+        async with login_state["lock"]:
+            if login_state["epoch"] == epoch:
+                await _do_login()
+                login_state["epoch"] += 1
+        ok = await _generate_image(params, browser)
+
+    downloads_dir = params["downloadsDir"]
+    image_list = [os.path.join(downloads_dir, f) for f in os.listdir(downloads_dir)] if os.path.exists(downloads_dir) else []
+    if len(image_list) == 0:
+        return {"errcode": 1, "errmsg": params.get("errmsg") or "生成失败或超时"}
+    return {"errcode": 0, "errmsg": "success", "data": {"imageList": image_list}}
+
+
+async def _keepalive(browser: Browser, interval: float):
+    # 定期访问首页刷新 cookie，避免长批量任务中途登录态过期
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            page, context = await _new_page(browser, None)
+            try:
+                await page.goto("https://jimeng.jianying.com/ai-tool/home", wait_until="domcontentloaded", timeout=60000)
+                # 服务端会话已失效时首页返回的是未登录 cookie，不能写回登录态
+                try:
+                    await page.locator("div#Personal>>img").first.wait_for(timeout=15000)
+                except Exception:
+                    logging.info("保活时检测到未登录，跳过保存登录态")
+                    continue
+                await _save_storage_state(context)
+            finally:
+                await _close_context(context)
+        except Exception as err:
+            logging.info(f"保活失败: {getattr(err, 'message', str(err))}")
+
+
+async def _run_batch(
+    jobs_path: str,
+    output_path: str,
+    out_dir: str,
+    concurrency: int,
+    default_model: str,
+    keepalive: float = 0,
+) -> Dict[str, Any]:
+    """批量生成：共享一个浏览器进程，按并发数执行 JSONL 任务。
+    每完成一个任务立即追加写入结果清单；再次运行时跳过清单中已成功的任务。
+    keepalive 大于 0 时，每隔 keepalive 秒在后台刷新一次登录态。
+    """
+    jobs = _load_jobs(jobs_path)
+    done_ids = _load_manifest_done(output_path)
+    pending = [job for job in jobs if job["id"] not in done_ids]
+    stats = {"total": len(jobs), "skipped": len(jobs) - len(pending), "success": 0, "failed": 0, "images": 0}
+    logging.info(f"批量任务共 {stats['total']} 个，跳过已完成 {stats['skipped']} 个")
+
+    os.makedirs(out_dir, exist_ok=True)
+    if os.path.dirname(output_path):
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+    queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+    for job in pending:
+        queue.put_nowait(job)
+
+    login_state = {"lock": asyncio.Lock(), "epoch": 0}
+    write_lock = asyncio.Lock()
+    started = time.monotonic()
+
+    _prepare_state("state.json")
+    if pending and _probe_session() is False:
+        logging.info("登录态已失效，先登录")
+        await _do_login()
+        login_state["epoch"] += 1
+
+    p, browser = await _start_browser(headless=True)
+    keepalive_task = asyncio.create_task(_keepalive(browser, keepalive)) if keepalive > 0 else None
+    try:
+        with open(output_path, "a", encoding="utf-8") as manifest:
+
+            async def worker():
+                while True:
+                    try:
+                        job = queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    job_started = time.monotonic()
+                    try:
+                        result = await _run_batch_job(job, browser, out_dir, login_state, default_model)
+                    except Exception as err:
+                        logging.info(f"任务 {job['id']} 异常: {getattr(err, 'message', str(err))}")
+                        result = {"errcode": 1, "errmsg": getattr(err, "message", str(err)) or "生成异常"}
+
+                    image_list = result.get("data", {}).get("imageList", [])
+                    record = {
+                        "id": job["id"],
+                        "prompt": job.get("prompt"),
+                        "size": job.get("size"),
+                        "model": job.get("model") or default_model,
+                        "refs": job.get("refs") or [],
+                        "errcode": result.get("errcode", 1),
+                        "errmsg": result.get("errmsg", ""),
+                        "imageList": image_list,
+                        "elapsed": round(time.monotonic() - job_started, 2),
+                    }
+                    async with write_lock:
+                        manifest.write(json.dumps(record, ensure_ascii=False) + "\n")
+                        manifest.flush()
+                        if record["errcode"] == 0:
+                            stats["success"] += 1
+                            stats["images"] += len(image_list)
+                        else:
+                            stats["failed"] += 1
+                    logging.info(f"任务 {job['id']} 完成: {record['errmsg']}（{record['elapsed']}s）")
+
+            await asyncio.gather(*[worker() for _ in range(max(1, concurrency))])
+    finally:
+        if keepalive_task is not None:
+            # 等待保活任务退出（包括关闭其 context）后再关闭浏览器
+            keepalive_task.cancel()
+            try:
+                await keepalive_task
+            except asyncio.CancelledError:
+                pass
+        await _close_all([browser.close, p.stop])
+
+    elapsed = time.monotonic() - started
+    finished = stats["success"] + stats["failed"]
+    stats["elapsed"] = round(elapsed, 2)
+    stats["jobsPerMinute"] = round(finished * 60 / elapsed, 2) if elapsed > 0 else 0
+    stats["failureRate"] = round(stats["failed"] / finished, 4) if finished else 0
+    return stats
+
+
 async def _cli_main(argv: List[str]):
     import argparse
     parser = argparse.ArgumentParser(description="Nect CLI (Python版)")
@@ -499,9 +965,23 @@ async def _cli_main(argv: List[str]):
     parser.add_argument("--prompt", "-p", default="咖啡屋街边平台，吧台桌椅，绿植鲜花，香薰蜡烛，户外灯X石砌地面的小巷，一侧是老旧的咖啡屋。桌面山热咖啡，小蛋糕，悬挂着一盏亮起的古朴灯笼")
     parser.add_argument("--size", "-s", default="9:16")
     parser.add_argument("--refs", "-r", default="", help="引用图片列表(JSON数组)")
+    parser.add_argument("--batch", "-b", default="", help="批量任务文件(JSONL，每行 {prompt, size, model, refs})")
+    parser.add_argument("--output", "-o", default="", help="批量结果清单(JSONL)，默认为任务文件名加 .manifest.jsonl")
+    parser.add_argument("--out-dir", default=os.path.join(root_path, "batch"), help="批量图片保存目录")
+    parser.add_argument("--concurrency", "-c", type=int, default=2, help="批量并发数")
+    parser.add_argument("--keepalive", type=float, default=0, help="批量时后台刷新登录态的间隔(秒)，0 为关闭")
     # 去掉服务模式，仅保留命令行生成
     args = parser.parse_args(argv)
 
+    if args.batch:
+        try:
+            output_path = args.output or os.path.splitext(args.batch)[0] + ".manifest.jsonl"
+            stats = await _run_batch(args.batch, output_path, args.out_dir, args.concurrency, args.model, args.keepalive)
+            print(json.dumps(stats, ensure_ascii=False))
+        except Exception as error:
+            await _set_response({"errcode": 1, "errmsg": getattr(error, "message", str(error))})
+        return
+
     try:
         if args.size not in SIZE_PRESET:
             raise ValueError("分辨率参数错误")